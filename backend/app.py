@@ -1,7 +1,13 @@
-import subprocess
+import atexit
+import multiprocessing as mp
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
+import pipeline as pipeline_mod
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
@@ -9,13 +15,78 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
 TESTS_DIRECTORY = os.path.join(ROOT_DIR, "inputs")
+# the number of pipeline worker processes, gunicorn sets it so its workers' pools together use every CPU once
+PIPELINE_WORKERS = int(os.environ.get("ETL_PIPELINE_WORKERS", os.cpu_count()))
+
+# a single worker pool is shared by all requests, so workers are started once and not per request.
+# it is created on first use: the forkserver workers import this module again (as __mp_main__ under
+# python app.py), and must not start a pool of their own
+pipeline_pool = None
+pipeline_pool_lock = threading.Lock()
+
+
+def create_pipeline_pool():
+    """
+    Creates the process pool running the pipelines.
+    forkserver workers are forked from a clean server process instead of the running Flask app.
+    The input files reference their context paths relative to the repository root, so the workers run from there.
+    """
+    return ProcessPoolExecutor(
+        max_workers=PIPELINE_WORKERS,
+        mp_context=mp.get_context("forkserver"),
+        initializer=os.chdir,
+        initargs=(ROOT_DIR,),
+    )
+
+
+def shutdown_pipeline_pool():
+    """Shuts down the process pool running the pipelines, if it was started."""
+    if pipeline_pool is not None:
+        pipeline_pool.shutdown()
+
+
+def get_pipeline_pool():
+    """
+    Get the process pool shared by all requests, creating it on first use.
+
+    :return: The ProcessPoolExecutor running the pipelines.
+    """
+    global pipeline_pool
+    with pipeline_pool_lock:
+        if pipeline_pool is None:
+            pipeline_pool = create_pipeline_pool()
+            atexit.register(shutdown_pipeline_pool)
+        return pipeline_pool
+
+
+def restart_pipeline_pool(broken_pool):
+    """
+    Replaces the process pool after one of its workers died, a broken pool rejects all further work.
+    Concurrent requests may find the same broken pool, only the first of them replaces it.
+
+    :param broken_pool: The broken process pool.
+    :return: The process pool replacing it.
+    """
+    global pipeline_pool
+    with pipeline_pool_lock:
+        if pipeline_pool is broken_pool:
+            pipeline_pool = create_pipeline_pool()
+            broken_pool.shutdown(wait=False)
+        return pipeline_pool
+
+
+# the listing of the inputs directory, rescanned only when the directory modification time changes
+input_files_cache = {"mtime": None, "files": []}
 
 @app.route("/list-files", methods=["GET"])
 def list_files():
     """Returns a list of available JSON files in the inputs directory."""
     try:
-        files = [f for f in os.listdir(TESTS_DIRECTORY) if f.endswith(".json")]
-        return jsonify({"files": files}), 200
+        mtime = os.stat(TESTS_DIRECTORY).st_mtime_ns
+        if mtime != input_files_cache["mtime"]:
+            input_files_cache["files"] = [f for f in os.listdir(TESTS_DIRECTORY) if f.endswith(".json")]
+            input_files_cache["mtime"] = mtime
+        return jsonify({"files": input_files_cache["files"]}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -28,6 +99,8 @@ def run_pipeline():
     Converts file paths to absolute before running.
     """
     data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
     input_files = data.get("input_files", [])
 
     if not input_files:
@@ -35,6 +108,11 @@ def run_pipeline():
 
     logs = {}
     results = {}
+    futures = {}
+    pool = get_pipeline_pool()
+    # the pool workers don't start nested pools unasked, each file's TXT stages get an explicit share of
+    # the CPUs, so a single large file still uses every CPU
+    txt_workers = max(1, os.cpu_count() // min(len(input_files), PIPELINE_WORKERS))
 
     for input_file in input_files:
         file_path = os.path.join(TESTS_DIRECTORY, input_file)
@@ -45,15 +123,34 @@ def run_pipeline():
             logs[input_file] = f"Error: File {file_path} does not exist."
             continue
 
-        process = subprocess.run(
-            ["python", "backend/pipeline.py", file_path],
-            capture_output=True,
-            text=True,
-            cwd=ROOT_DIR,  # ✅ Ensuring correct working directory
-        )
-
-        logs[input_file] = process.stdout or process.stderr
-        results[input_file] = "Pipeline completed successfully" if process.returncode == 0 else "Pipeline failed"
+        # run the files concurrently on the worker pool, a pool broken since the last request is replaced first
+        try:
+            try:
+                futures[pool.submit(pipeline_mod.run, file_path, txt_workers)] = input_file
+            except BrokenProcessPool:
+                pool = restart_pipeline_pool(pool)
+                futures[pool.submit(pipeline_mod.run, file_path, txt_workers)] = input_file
+        except Exception:
+            logs[input_file] = traceback.format_exc()
+            results[input_file] = "Pipeline failed"
+
+    broken = False
+    for future in as_completed(futures):
+        input_file = futures[future]
+        try:
+            output, ok = future.result()
+        except BrokenProcessPool:
+            # a worker died, all the files still running on the pool fail
+            output, ok = traceback.format_exc(), False
+            broken = True
+        except Exception:
+            output, ok = traceback.format_exc(), False
+
+        logs[input_file] = output
+        results[input_file] = "Pipeline completed successfully" if ok else "Pipeline failed"
+
+    if broken:
+        restart_pipeline_pool(pool)
 
     return jsonify({"logs": logs, "results": results})
 
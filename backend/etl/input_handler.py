@@ -1,7 +1,10 @@
 import os
+import functools
 import logging
 import re
 
+# compiled once at import instead of on every validation call
+UUID_PATTERN = re.compile(r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})')
 
 def validate_input_file(input_data):
     """
@@ -19,25 +22,7 @@ def validate_input_file(input_data):
         if not context_path or not os.path.exists(context_path):
             raise FileNotFoundError(f"Invalid or missing context path: {context_path}")
 
-        # validate result path is given in the input argument
-        if not results_path:
-            raise ValueError("Results path is not specified.")
-
-        # validate results path is named "out"
-        if not results_path.endswith("/out/"):
-            raise ValueError(f"Results path {results_path} does not end with '/out/'")
-
-        # validate results path is a subdirectory of the context path
-        results_parent = os.path.dirname(results_path.rstrip('/'))
-        if results_parent != context_path.rstrip('/'):
-            raise ValueError(
-                f"Context path {context_path} and results path {results_path} must share the same base directory")
-
-        # validate that context path and results path is a valid UUID
-        context_uuid = extract_uuid_from_path(context_path)
-        if not context_uuid:
-            raise ValueError(f"{context_path} is not a valid path. Last component must be a valid UUID")
-
+        validate_paths_format(context_path, results_path)
 
         logging.info(f"Validation successful for context_path: {context_path}, results_path: {results_path}")
         return context_path, results_path
@@ -47,24 +32,66 @@ def validate_input_file(input_data):
         raise
 
 
+@functools.lru_cache(maxsize=256)
+def validate_paths_format(context_path, results_path):
+    """
+    Validate the format of the context and results paths.
+    The checks depend on the paths only, so successful validations are cached per paths.
+
+    :param context_path: Directory containing participant files.
+    :param results_path: Path to save the output file.
+    :raises ValueError: If the results path is missing, or the paths are not in the expected format.
+    """
+    # validate result path is given in the input argument
+    if not results_path:
+        raise ValueError("Results path is not specified.")
+
+    # validate results path is named "out"
+    if not results_path.endswith("/out/"):
+        raise ValueError(f"Results path {results_path} does not end with '/out/'")
+
+    # validate results path is a subdirectory of the context path
+    results_parent = os.path.dirname(results_path.rstrip('/'))
+    if results_parent != context_path.rstrip('/'):
+        raise ValueError(
+            f"Context path {context_path} and results path {results_path} must share the same base directory")
+
+    # validate that context path and results path is a valid UUID
+    context_uuid = extract_uuid_from_path(context_path)
+    if not context_uuid:
+        raise ValueError(f"{context_path} is not a valid path. Last component must be a valid UUID")
+
+
 def validate_context_path_files(context_path):
     """
     Validate there are exactly two files in the context path, ensure naming conventions.
+    The result is cached until the directory modification time changes (a file is added, removed or renamed).
+
+    :param context_path: Directory containing participant files.
+    :return: A tuple (participant_id, participant_files) of the participant ID shared by the files,
+        and a dictionary of validated file paths.
+    """
+    participant_id, participant_files = validate_context_path_listing(context_path, os.stat(context_path).st_mtime_ns)
+    logging.info(f"Validation successful for files in {context_path}")
+    return participant_id, dict(participant_files) # copy, so callers can't modify the cached result
 
 
+@functools.lru_cache(maxsize=256)
+def validate_context_path_listing(context_path, mtime):
+    """
+    Helper function - Validate the files in the context path, for validate_context_path_files.
+
     :param context_path: Directory containing participant files.
-    :return: Dictionary of validated file paths.
+    :param mtime: Modification time of the directory, only used as part of the cache key.
+    :return: A tuple (participant_id, participant_files) of the participant ID shared by the files,
+        and a dictionary of validated file paths.
     """
     # initialize a dictionary to store file paths, and a set to validate the uuid id identical for both files
     participant_files = {}
     participant_id_set = set()
 
     # get the list of files in the directory
-    files = [
-        file for file in os.listdir(context_path)
-        if os.path.isfile(os.path.join(context_path, file))
-        and not file.startswith(".")  # Exclude hidden files like .DS_Store
-    ]
+    files = list_context_path_files(context_path)
 
     # validate that only two files exist
     if len(files) != 2:
@@ -107,8 +134,24 @@ def validate_context_path_files(context_path):
         logging.error(f"Missing .txt or .json files in {context_path}")
         raise ValueError(f"Missing .txt or .json file for participant in {context_path}.")
 
-    logging.info(f"Validation successful for files in {context_path}")
-    return participant_files
+    return participant_id, participant_files
+
+def list_context_path_files(context_path):
+    """
+    List the non-hidden files in the context path.
+
+    :param context_path: Directory containing participant files.
+    :return: A list of file names.
+    """
+    # scandir reads the file types along with the names, instead of a stat call per entry
+    with os.scandir(context_path) as entries:
+        files = [
+            entry.name for entry in entries
+            if entry.is_file()
+            and not entry.name.startswith(".")  # Exclude hidden files like .DS_Store
+        ]
+    return files
+
 
 def extract_file_names(file_name):
     """
@@ -143,8 +186,7 @@ def is_valid_uuid(participant_id):
     :param participant_id: The participant ID to validate.
     :return: True if valid, False otherwise.
     """
-    uuid_pattern = r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})'
-    match = re.search(uuid_pattern, participant_id)
+    match = UUID_PATTERN.search(participant_id)
     if match:
         return match.group(1)
     return None
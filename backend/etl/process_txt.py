@@ -1,7 +1,93 @@
-from multiprocessing import Pool, cpu_count
+import os
+from multiprocessing import cpu_count, parent_process
+from concurrent.futures import ProcessPoolExecutor
 from itertools import combinations
+from collections import Counter
 import logging
 
+# files with at most this many sequences are processed in-process, the pool overhead would outweigh the work
+PARALLEL_MIN_SEQUENCES = 4
+# per-sequence analysis runs at C speed, it is only worth sending to the pool for files with at least this many bases
+PARALLEL_MIN_BASES = int(os.environ.get("ETL_PARALLEL_MIN_BASES", 10_000_000))
+# the pairwise LCS search costs roughly len1 * len2 per pair, below this total (about 0.1s of work)
+# starting the pool and shipping the sequences costs more than the search itself
+PARALLEL_MIN_LCS_CELLS = 30_000_000
+# above this sequence length the LCS is found in one pass over all the sequences instead of comparing every pair
+GLOBAL_LCS_MIN_LENGTH = 2000
+
+process_pool = None
+# the number of processes the TXT stages may use, set by the caller with set_process_pool_workers.
+# by default a worker per CPU, but none inside a worker process (e.g. a pipeline run by the API's pool),
+# where a nested pool of cpu_count() processes per worker would start unasked
+process_pool_workers = None
+
+
+def set_process_pool_workers(workers):
+    """
+    Set the number of processes the TXT stages may use, replacing the shared pool if it has another size.
+
+    :param workers: The number of processes, 1 to process everything in the calling process,
+        None for the default.
+    """
+    global process_pool_workers
+    if workers != process_pool_workers:
+        shutdown_process_pool()
+    process_pool_workers = workers
+
+
+def get_process_pool_workers():
+    """
+    Get the number of processes the TXT stages may use.
+
+    :return: The number set with set_process_pool_workers, otherwise the CPU count in a main process
+        and 1 inside a worker process.
+    """
+    if process_pool_workers is not None:
+        return process_pool_workers
+    return cpu_count() if parent_process() is None else 1
+
+
+def get_process_pool():
+    """
+    Get the process pool shared by all the TXT processing stages, creating it on first use.
+
+    :return: A ProcessPoolExecutor with get_process_pool_workers() workers.
+    """
+    global process_pool
+    if process_pool is None:
+        process_pool = ProcessPoolExecutor(max_workers=get_process_pool_workers())
+    return process_pool
+
+
+def shutdown_process_pool():
+    """
+    Shut down the shared process pool, if it was started.
+    Inside a worker process this has to happen before the worker exits, which otherwise waits forever for the
+    processes of the pool.
+    """
+    global process_pool
+    if process_pool is not None:
+        process_pool.shutdown()
+        process_pool = None
+
+
+def parallel_map(func, items):
+    """
+    Helper function - Apply a function to every item on the shared process pool.
+    Items are sent to the workers in chunks to reduce the inter-process communication per task.
+    With a single process to use, the items are processed in the calling process without starting a pool.
+
+    :param func: A picklable function taking a single item.
+    :param items: A list of items to process.
+    :return: A list of the results, in the same order as the items.
+    """
+    workers = get_process_pool_workers()
+    if workers <= 1:
+        return list(map(func, items))
+    chunksize = max(1, len(items) // (4 * workers))
+    return list(get_process_pool().map(func, items, chunksize=chunksize))
+
+
 def calc_gc_content(sequence):
     """
     Calculate the GC content of a DNA sequence as a percentage.
@@ -9,17 +95,12 @@ def calc_gc_content(sequence):
     :param sequence: A string representing the DNA sequence.
     :return: GC content percentage, rounded to two decimal places.
     """
-    logging.debug("Calculating GC content.")
     length = len(sequence)
-    count_c = 0
-    count_g = 0
-    for char in sequence:
-        if char == 'C':
-            count_c += 1
-        if char == 'G':
-            count_g += 1
-    gc_content = round((100 * (count_c + count_g)) / length, 2)
-    logging.debug("GC content of DNA sequence is %f.", gc_content)
+    if not length:
+        return 0.0
+    # str.count scans the sequence in C, much faster than a per-character Python loop
+    count_gc = sequence.count('C') + sequence.count('G')
+    gc_content = round((100 * count_gc) / length, 2)
     return gc_content
 
 def compute_codon_frequency(sequence):
@@ -29,33 +110,24 @@ def compute_codon_frequency(sequence):
     :param sequence: A string representing the DNA sequence.
     :return: A dictionary with codons as keys and their frequencies as values.
     """
-    logging.debug("Computing codon frequency.")
-    codon_freq = {}
-    for i in range(0, len(sequence) - len(sequence) % 3, 3):
-        if sequence[i:i+3] in codon_freq:
-            codon_freq[sequence[i:i + 3]] += 1
-        else:
-            codon_freq[sequence[i:i + 3]] = 1
-    logging.debug(f"Codon frequency: {codon_freq}")
+    # zip the three reading-frame strides into (base, base, base) codon keys and count them in C,
+    # without slicing a new string per codon. zip stops at the shortest stride, dropping a partial codon
+    codon_counts = Counter(zip(sequence[0::3], sequence[1::3], sequence[2::3]))
+    codon_freq = {"".join(codon): count for codon, count in codon_counts.items()}
     return codon_freq
 
-def compute_most_frequent_codon(sequences):
+def compute_most_frequent_codon(codon_frequencies):
     """
     Compute the most frequent codon across the DNA sequences.
 
-    :param sequences: A list of strings, each representing a DNA sequence.
+    :param codon_frequencies: A list of the codon frequency dictionaries computed for each sequence.
     :return: The most frequent codon as a string.
     """
-    logging.debug("Computing longest common subsequence (LCS).")
-    total_codon_count = {}
-    for sequence in sequences:
-        # use compute_codon_frequency to calculate frequency per sequence
-        codon_freq = compute_codon_frequency(sequence)
-        for codon, count in codon_freq.items():
-            if codon in total_codon_count:
-                total_codon_count[codon] += count
-            else:
-                total_codon_count[codon] = count
+    logging.debug("Computing most frequent codon.")
+    # sum the per-sequence codon counts instead of counting the sequences again
+    total_codon_count = Counter()
+    for codon_freq in codon_frequencies:
+        total_codon_count.update(codon_freq)
     # compute the frequency of the most common codon
     max_frequency = max(total_codon_count.values())
     # in case of more than one most frequent codon, find all of them
@@ -65,40 +137,220 @@ def compute_most_frequent_codon(sequences):
     ]
     # join the results to the expected format
     results = ", ".join(most_frequent_codons)
-    logging.debug(f"most frequent codon: {most_frequent_codons}.")
+    logging.debug("most frequent codon: %s.", most_frequent_codons)
     return results
 
 
-def find_lcs_of_two(sequence1, sequence2):
+def find_lcs_of_two(sequence1, sequence2, min_length=0):
     """
     Helper function - Find the longest common contiguous substring between two sequences.
 
     :param sequence1: A string representing the first DNA sequence.
     :param sequence2: A string representing the second DNA sequence.
+    :param min_length: Common substrings shorter than this length are not searched for.
+    :return: The longest common substring, the first one in sequence1 in case of a tie.
+        An empty string when it is shorter than min_length.
     """
-    n, m = len(sequence1), len(sequence2)
-    longest_sub = ""
-    # try all possible starting positions in sequence1
-    for i in range(n):
-        # for each starting position, try increasing lengths
-        for length in range(1, n - i + 1):
-            current_sub = sequence1[i:i + length]
-            # If this substring appears in sequence2 and is longer than current best, replace it
-            if current_sub in sequence2 and len(current_sub) > len(longest_sub):
-                longest_sub = current_sub
-    return longest_sub
+    # when one sequence contains the other (or they are identical), the shorter one is the answer,
+    # found with a substring search in C instead of probing every start position
+    if sequence2 in sequence1:
+        return sequence2 if len(sequence2) >= min_length else ""
+    if sequence1 in sequence2:
+        return sequence1 if len(sequence1) >= min_length else ""
+
+    # scan the start positions in sequence1, probing only for a substring one character longer than the
+    # longest found so far, with a single substring search in C per probe
+    length = len(sequence1)
+    longest_length, longest_start = max(min_length - 1, 0), None
+    for start in range(length):
+        # the substrings starting from here are too short to beat the longest one, stop early
+        if length - start <= longest_length:
+            break
+        # keep the first longest substring found, replace it only with a strictly longer one
+        while start + longest_length < length and sequence1[start:start + longest_length + 1] in sequence2:
+            longest_length += 1
+            longest_start = start
+    if longest_start is None:
+        return ""
+    return sequence1[longest_start:longest_start + longest_length]
+
+
+def process_lcs_batch(batch):
+    """
+    Helper function for multiprocessing: Compute LCS for a batch of sequence pairs.
+    The sequences are sent to the worker once per batch, and the pairs only as indices into them.
+    Pairs that cannot reach the longest LCS found so far in the batch are skipped.
 
+    :param batch: A tuple of a list of DNA sequences and a list of (i, j, upper_bound) pairs of indices into it,
+        sorted by the upper bound of their LCS length in descending order.
+    :return: A list of the LCS of each pair, in the order of the pairs, empty for the skipped pairs.
+    """
+    sequences, index_pairs = batch
+    results = []
+    longest_length = 0
+    for i, j, upper_bound in index_pairs:
+        # the pairs are sorted by their upper bound, none of the remaining pairs can reach the longest LCS
+        if upper_bound < longest_length:
+            results.extend([""] * (len(index_pairs) - len(results)))
+            break
+        # ties of the longest length are still needed, only shorter substrings are not searched for
+        lcs = find_lcs_of_two(sequences[i], sequences[j], longest_length)
+        longest_length = max(longest_length, len(lcs))
+        results.append(lcs)
+    return results
 
-def process_lcs_pair(pair):
+def find_pairwise_lcs_candidates(sequences):
     """
-    Helper function for multiprocessing: Compute LCS for a sequence pair.
+    Helper function - Compute the LCS of every sequence pair and keep the longest ones.
 
-    :param pair: A pair of strings representing the DNA sequences.
-    :return: A string representing the LCS of the pair.
+    :param sequences: A list of strings, each representing a DNA sequence.
+    :return: A dictionary mapping each of the longest pairwise LCS values to the (1-based) indices of the
+        sequences containing it.
     """
-    seq1, seq2 = pair
-    lcs = find_lcs_of_two(seq1, seq2)
-    return lcs
+    # generate all possible sequence pairs with their indices
+    pair_indices = list(combinations(range(len(sequences)), 2))
+    sequence_pairs = [(sequences[i], sequences[j]) for i, j in pair_indices]
+    # duplicate sequences produce identical pairs, compute the LCS of each distinct pair only once
+    unique_pairs = list(dict.fromkeys(sequence_pairs))
+    unique_sequences = list(dict.fromkeys(sequences))
+    sequence_index = {sequence: index for index, sequence in enumerate(unique_sequences)}
+
+    # a common substring of two sequences can't be longer than the number of bases they have in common,
+    # search the pairs with the highest bound first so the pairs that can't reach the longest LCS are skipped
+    base_counts = [Counter(sequence) for sequence in unique_sequences]
+    index_pairs = []
+    for seq1, seq2 in unique_pairs:
+        i, j = sequence_index[seq1], sequence_index[seq2]
+        upper_bound = sum((base_counts[i] & base_counts[j]).values())
+        index_pairs.append((i, j, upper_bound))
+    order = sorted(range(len(index_pairs)), key=lambda k: index_pairs[k][2], reverse=True)
+    unique_pairs = [unique_pairs[k] for k in order]
+    index_pairs = [index_pairs[k] for k in order]
+
+    lcs_cells = sum(len(seq1) * len(seq2) for seq1, seq2 in unique_pairs)
+    if len(sequences) > PARALLEL_MIN_SEQUENCES and lcs_cells >= PARALLEL_MIN_LCS_CELLS:
+        # send every worker batch the distinct sequences once with index pairs, instead of pickling both
+        # sequences of every pair. striding the sorted pairs spreads the costly ones over all the batches
+        batches_count = min(len(index_pairs), 4 * get_process_pool_workers())
+        batches = [(unique_sequences, index_pairs[k::batches_count]) for k in range(batches_count)]
+        unique_results = [None] * len(index_pairs)
+        for k, batch_results in enumerate(parallel_map(process_lcs_batch, batches)):
+            unique_results[k::batches_count] = batch_results
+    else:
+        unique_results = process_lcs_batch((unique_sequences, index_pairs))
+    lcs_by_pair = dict(zip(unique_pairs, unique_results))
+    lcs_results = [lcs_by_pair[pair] for pair in sequence_pairs]
+
+    # track all candidates of maximum length, with the sequences of the pairs they were found in
+    max_length = 0
+    candidates = {}
+
+    # find the maximum length from the subsequences found
+    for (i, j), lcs in zip(pair_indices, lcs_results):
+        length = len(lcs)
+        if length < max_length or not lcs:
+            continue
+        if length > max_length:
+            max_length = length
+            candidates = {} # longer subsequence found, reset the candidates
+        candidates.setdefault(lcs, set()).update((i, j))
+
+    # a candidate may also appear in sequences whose pairs resolved a tie to another substring,
+    # only the sequences not already known to contain it are searched
+    return {
+        candidate: [k + 1 for k, seq in enumerate(sequences) if k in found_in or candidate in seq]
+        for candidate, found_in in candidates.items()
+    }
+
+
+def compute_longest_common_substring_global(sequences):
+    """
+    Helper function - Find the longest substrings shared by at least two sequences in a single pass.
+    Builds a generalized suffix automaton of all the sequences, where every state stands for a set of substrings
+    and records which sequences contain them, so no sequence pair has to be compared.
+    Returns the same candidates as the pairwise search.
+
+    :param sequences: A list of strings, each representing a DNA sequence.
+    :return: A dictionary mapping each of the longest pairwise LCS values to the (1-based) indices of the
+        sequences containing it.
+    """
+    # per state: length of its longest substring, suffix link, transitions and the end of an occurrence
+    lengths, links, transitions, ends = [0], [-1], [{}], [(0, 0)]
+
+    def add_state(length, link, state_transitions, end):
+        lengths.append(length)
+        links.append(link)
+        transitions.append(state_transitions)
+        ends.append(end)
+        return len(lengths) - 1
+
+    def split_state(p, q, char):
+        # clone q into a state holding only its substrings up to length lengths[p] + 1
+        clone = add_state(lengths[p] + 1, links[q], dict(transitions[q]), ends[q])
+        while p != -1 and transitions[p].get(char) == q:
+            transitions[p][char] = clone
+            p = links[p]
+        links[q] = clone
+        return clone
+
+    for index, sequence in enumerate(sequences):
+        last = 0
+        for position, char in enumerate(sequence, 1):
+            q = transitions[last].get(char)
+            if q is not None:
+                # this prefix already appeared in a previous sequence
+                last = q if lengths[q] == lengths[last] + 1 else split_state(last, q, char)
+                continue
+            current = add_state(lengths[last] + 1, 0, {}, (index, position))
+            p = last
+            while p != -1 and char not in transitions[p]:
+                transitions[p][char] = current
+                p = links[p]
+            if p != -1:
+                q = transitions[p][char]
+                links[current] = q if lengths[p] + 1 == lengths[q] else split_state(p, q, char)
+            last = current
+
+    # mark the sequences containing each state's substrings as a bitmask: walk every sequence's prefixes,
+    # the suffixes of a prefix are the states along its suffix links
+    masks = [0] * len(lengths)
+    for index, sequence in enumerate(sequences):
+        bit = 1 << index
+        state = 0
+        for char in sequence:
+            state = transitions[state][char]
+            p = state
+            while p > 0 and not masks[p] & bit:
+                masks[p] |= bit
+                p = links[p]
+
+    # states contained in at least two sequences (more than one bit set)
+    shared = [state for state in range(1, len(lengths)) if masks[state] & (masks[state] - 1)]
+    if not shared:
+        return {}
+    max_length = max(lengths[state] for state in shared)
+    longest = []
+    for state in shared:
+        if lengths[state] == max_length:
+            index, end = ends[state]
+            longest.append((sequences[index][end - max_length:end], masks[state]))
+
+    # like the pairwise search, every sequence pair contributes only the first of its longest common substrings
+    # in the pair's first sequence. the masks tell which pairs share each substring, no pair has to be compared
+    candidates = {}
+    for i, sequence in enumerate(sequences):
+        in_sequence = sorted((sequence.find(substring), substring, mask)
+                             for substring, mask in longest if mask >> i & 1)
+        for j in range(i + 1, len(sequences)):
+            for _, substring, mask in in_sequence:
+                if mask >> j & 1:
+                    candidates.setdefault(substring, mask)
+                    break
+    return {
+        substring: [k + 1 for k in range(len(sequences)) if mask >> k & 1]
+        for substring, mask in candidates.items()
+    }
+
 
 def compute_longest_common_subsequence(sequences):
     """
@@ -112,24 +364,11 @@ def compute_longest_common_subsequence(sequences):
     if not sequences:
         return {"value": "", "sequences": [], "length": 0}
 
-    # generate all possible sequence pairs with their indices, and Use multiprocessing for efficiency
-    sequence_pairs = [(sequences[i], sequences[j]) for i, j in combinations(range(len(sequences)), 2)]
-    with Pool(processes=cpu_count()) as pool:
-        lcs_results = pool.map(process_lcs_pair, sequence_pairs)
-
-    # track all candidates of maximum length
-    max_length = 0
-    candidates = []
-
-    # find the maximum length from the subsequences found
-    for lcs in lcs_results:
-        if lcs and len(lcs) >= max_length:
-            if len(lcs) > max_length:
-                max_length = len(lcs)
-                candidates = [] # longer subsequence found, reset the candidates list
-            candidates.append(lcs)
-
-    candidates = list(dict.fromkeys(candidates)) # Remove duplicates
+    if max(map(len, sequences)) > GLOBAL_LCS_MIN_LENGTH:
+        # comparing every pair of long sequences is too slow, find the candidates in one pass instead
+        candidates = compute_longest_common_substring_global(sequences)
+    else:
+        candidates = find_pairwise_lcs_candidates(sequences)
 
     # If no common substrings found
     if not candidates:
@@ -138,9 +377,8 @@ def compute_longest_common_subsequence(sequences):
     max_occurrences = 0
     best_results = {}  # store all lcs that have the same length and frequency
 
-    # for each candidate, find all sequences it appears in
-    for candidate in candidates:
-        sequence_indices = [i + 1 for i, seq in enumerate(sequences) if candidate in seq]
+    # each candidate comes with all the sequences it appears in
+    for candidate, sequence_indices in candidates.items():
         current_occurrences = len(sequence_indices)
 
         if current_occurrences >= max_occurrences:
@@ -172,9 +410,15 @@ def process_sequence(sequence):
         - "gc_content": The GC content percentage of the sequence.
         - "codons": A dictionary where keys are codons (triplets) and values are their frequencies.
     """
-    logging.debug("Processing individual sequence.")
-    gc_content = calc_gc_content(sequence)
     codons_frequency = compute_codon_frequency(sequence)
+    if not sequence:
+        return {"gc_content": 0.0, "codons": codons_frequency}
+    # derive the GC count from the codon counts instead of scanning the sequence a second time,
+    # only the partial codon at the end (up to 2 bases) is not covered by the codons
+    count_gc = sum((codon.count('C') + codon.count('G')) * count for codon, count in codons_frequency.items())
+    tail = sequence[len(sequence) - len(sequence) % 3:]
+    count_gc += tail.count('C') + tail.count('G')
+    gc_content = round((100 * count_gc) / len(sequence), 2)
     return {"gc_content": gc_content, "codons": codons_frequency}
 
 
@@ -185,22 +429,24 @@ def process_txt_files(txt_file_path):
     :param txt_file_path: Path to the .txt file.
     :return: Processed results including GC content, codon frequency, and LCS.
     """
-    logging.info(f"Processing TXT file: {txt_file_path}")
-    with open(txt_file_path, 'r') as file: # remove trailing and leading blanks
-        sequences = [line.strip() for line in file if line.strip()]
+    logging.info("Processing TXT file: %s", txt_file_path)
+    with open(txt_file_path, 'r') as file: # read the whole file at once, and remove trailing and leading blanks
+        sequences = [line for line in map(str.strip, file.read().split('\n')) if line]
 
     if not sequences:
-        logging.error(f"Validation Error: TXT file {txt_file_path} is empty.")
+        logging.error("Validation Error: TXT file %s is empty.", txt_file_path)
         raise ValueError(f"TXT file {txt_file_path} is empty.")
 
-    logging.debug(f"Read {len(sequences)} sequences from {txt_file_path}")
+    logging.debug("Read %d sequences from %s", len(sequences), txt_file_path)
 
-    # use multiprocessing to process sequences in parallel
-    with Pool(processes=cpu_count()) as pool:
-        sequences_results = pool.map(process_sequence, sequences)
+    # use multiprocessing to process sequences in parallel, only when there is enough data to pay off
+    if sum(map(len, sequences)) >= PARALLEL_MIN_BASES:
+        sequences_results = parallel_map(process_sequence, sequences)
+    else:
+        sequences_results = [process_sequence(sequence) for sequence in sequences]
 
     # compute most common codon and lcs
-    most_common_codon = compute_most_frequent_codon(sequences)
+    most_common_codon = compute_most_frequent_codon([result["codons"] for result in sequences_results])
     lcs_result = compute_longest_common_subsequence(sequences)
 
     logging.info("Completed processing TXT file.")
@@ -1,97 +1,119 @@
-from datetime import datetime
+from datetime import date, datetime
 import json
 import logging
 
+# the fields expected to contain date values, and the range of the valid dates
+DATE_FIELDS = frozenset({"date_requested", "date_completed", "collection_date"})
+START_DATE = datetime(2014, 1, 1)
+END_DATE = datetime(2024, 12, 31)
 
-def remove_sensitive_fields(data):
-    """
-    Remove keys starting with '_' from the JSON object recursively.
 
-    :param data: JSON-like object (dict or list).
-    :return: The same structure with sensitive fields removed.
+def parse_date(value):
     """
-    # if the current instance is a dict, recursively search sensitive fields to remove among the values
-    if isinstance(data, dict):
-        return {
-            key: remove_sensitive_fields(value)
-            for key, value in data.items()
-            if not key.startswith('_')
-        }
-    # if the current instance is a list, recursively search sensitive fields to remove among the items
-    elif isinstance(data, list):
-        return [remove_sensitive_fields(item) for item in data]
-    else:
-        return data
+    Helper function - Parse a date string in the 'YYYY-MM-DD' format.
+    Dates written exactly as 'YYYY-MM-DD' are parsed by datetime.fromisoformat, over 20x faster than strptime,
+    which still parses any other value so the accepted formats and the format errors stay the same.
 
-def validate_fields_length(data):
+    :param value: The date string.
+    :return: The parsed date (datetime object).
+    :raises ValueError: If the date does not match the format.
     """
-    Validate that all string fields in the JSON are ≤ 64 characters.
+    if len(value) == 10 and value[4] == value[7] == '-':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, "%Y-%m-%d")
 
-    :param data: JSON-like object (dict or list).
-    :raises ValueError: If any string field exceeds 64 characters.
+
+def validate_date(key, value, start_date, end_date):
     """
-    # if the current instance is a dict, recursively validate dates among it's values
-    if isinstance(data, dict):
-        for key, value in data.items():
-            validate_fields_length(value)
-    # if the current instance is a list, recursively search validate fields length to remove among the items
-    elif isinstance(data, list):
-        for item in data:
-            validate_fields_length(item)
-    elif isinstance(data, str):
-        if len(data) > 64:
-            logging.error(f"String '{data}' exceeds 64 characters")
-            raise ValueError(f"String '{data}' exceeds 64 characters.")
+    Helper function - Validate that a date field is in the 'YYYY-MM-DD' format and within the given range.
 
+    :param key: The name of the date field.
+    :param value: The date string.
+    :param start_date: The earliest valid date (datetime object).
+    :param end_date: The latest valid date (datetime object).
+    :raises ValueError: If the date is in the wrong format or out of range.
+    """
+    try:
+        # parse and validate the date
+        parsed_date = parse_date(value)
+        if not start_date <= parsed_date <= end_date:  # raise an error if the field is out of the expected range
+            logging.error(f"Date '{value}' in field '{key}' is out of range.")
+            raise ValueError(f"Date '{value}' in field '{key}' is out of range.")
+
+    except ValueError as e:
+        if "does not match format" in str(e): # raise an error if date is not in the expected format
+            logging.error(f"invalid date format for field '{key}': {value}. Expected 'YYYY-MM-DD'.")
+            raise ValueError(f"Invalid date format for field '{key}': '{value}'. Expected 'YYYY-MM-DD'.")
+        else:
+            raise
 
 
-def validate_dates(data, start_date=None, end_date=None, date_fields=None):
+def validate_and_clean_fields(data, start_date, end_date, date_fields, date_errors):
     """
-    Validate that all dates in the JSON are within the range 2014-01-01 to 2024-12-31.
+    Validate in a single walk of the JSON that all string fields are ≤ 64 characters,
+    and that all dates are within the range start_date to end_date,
+    while removing the sensitive fields (keys starting with '_') in place.
+    A string length error is raised immediately, while the first date error is only collected, so the
+    caller can raise it after the whole JSON was checked for string length errors.
+    The sensitive fields are validated as well before they are removed.
 
     :param data: JSON-like object (dict or list).
-    :param end_date: The earliest valid date (datetime object).
-    :param start_date: The latest valid date (datetime object).
+    :param start_date: The earliest valid date (datetime object).
+    :param end_date: The latest valid date (datetime object).
     :param date_fields: A set of fields expected to contain date values.
-    :raises ValueError: If any date is out of range.
+    :param date_errors: A list to which the first date error found is appended.
+    :raises ValueError: If any string field exceeds 64 characters.
     """
-    # if the current instance is a dict, recursively execute the operation on it's value
-    if isinstance(data, dict):
+    # the parsed JSON holds only plain dicts, lists and strings (no subclasses),
+    # so the exact type is compared, cheaper than an isinstance check
+    data_type = type(data)
+    # if the current instance is a dict, recursively validate it's values, and the dates among them
+    if data_type is dict:
+        sensitive_keys = []
         for key, value in data.items():
-            if key in date_fields and isinstance(value, str):
+            validate_and_clean_fields(value, start_date, end_date, date_fields, date_errors)
+            if key.startswith('_'):
+                sensitive_keys.append(key)
+            elif key in date_fields and type(value) is str and not date_errors:
                 try:
-                    # parse and validate the date
-                    date = datetime.strptime(value, "%Y-%m-%d")
-                    if not start_date <= date <= end_date:  # raise an error if the field is out of the expected range
-                        logging.error(f"Date '{value}' in field '{key}' is out of range.")
-                        raise ValueError(f"Date '{value}' in field '{key}' is out of range.")
-
+                    validate_date(key, value, start_date, end_date)
                 except ValueError as e:
-                    if "does not match format" in str(e): # raise an error if date is not in the expected format
-                        logging.error(f"invalid date format for field '{key}': {value}. Expected 'YYYY-MM-DD'.")
-                        raise ValueError(f"Invalid date format for field '{key}': '{value}'. Expected 'YYYY-MM-DD'.")
-                    else:
-                        raise
-            elif isinstance(value, (dict, list)): # recursively validate nested structures
-                validate_dates(value, start_date, end_date, date_fields)
-    # if the current instance is a list, recursively execute the operation on it's items
-    elif isinstance(data, list):
+                    date_errors.append(e)
+        # the keys can't be removed while iterating the dict
+        for key in sensitive_keys:
+            del data[key]
+    # if the current instance is a list, recursively validate it's items
+    elif data_type is list:
         for item in data:
-            validate_dates(item, start_date, end_date, date_fields)
+            validate_and_clean_fields(item, start_date, end_date, date_fields, date_errors)
+    elif data_type is str:
+        if len(data) > 64:
+            logging.error(f"String '{data}' exceeds 64 characters")
+            raise ValueError(f"String '{data}' exceeds 64 characters.")
 
 
 
-def validate_participants_age(data):
+def validate_participants_age(data, today=None):
     """
     Validate that the participant is at least 40 years old.
 
     :param data: JSON-like object (dict).
+    :param today: The date to calculate the age at (date object), the current date if not given.
     :raises ValueError: If the participant's age is < 40.
     """
+    if today is None:
+        today = date.today()
     if "individual_metadata" in data and "date_of_birth" in data["individual_metadata"]:
         try:
-            date_of_birth = datetime.strptime(data["individual_metadata"]["date_of_birth"], "%Y-%m-%d")
-            participants_age = (datetime.now() - date_of_birth).days // 365
+            date_of_birth = parse_date(data["individual_metadata"]["date_of_birth"])
+            # the age in full calendar years, one less if the birthday didn't come yet this year.
+            # counting the days in 365 day years would overcount by the leap days
+            participants_age = today.year - date_of_birth.year - (
+                (today.month, today.day) < (date_of_birth.month, date_of_birth.day)
+            )
             if participants_age < 40:
                 logging.error(f"Participant's age '{participants_age}' is less than 40 years old.")
                 raise ValueError(f"Participant's age '{participants_age}' is less than 40 years old.")
@@ -116,14 +138,11 @@ def process_json_files(json_file_path):
     try:
         logging.info(f"Validating JSON file: {json_file_path}")
 
-        logging.debug("Validating fields length")
-        validate_fields_length(data)
-
-        start_date = datetime(2014, 1, 1)
-        end_date = datetime(2024, 12, 31)
-        date_fields = {"date_requested", "date_completed", "collection_date"}
-        logging.debug("Validating dates.")
-        validate_dates(data, start_date, end_date, date_fields)
+        logging.debug("Validating fields length and dates, and removing sensitive fields.")
+        date_errors = []
+        validate_and_clean_fields(data, START_DATE, END_DATE, DATE_FIELDS, date_errors)
+        if date_errors:
+            raise date_errors[0]
 
         logging.debug("Validating participant's age.")
         validate_participants_age(data)
@@ -131,7 +150,6 @@ def process_json_files(json_file_path):
     except Exception:
         raise
 
-    data = remove_sensitive_fields(data)
     logging.info("JSON file validation and processing complete.")
     return data
 
@@ -0,0 +1,19 @@
+import os
+from multiprocessing import cpu_count
+
+# gunicorn settings for serving the Flask API, run from the backend folder with: gunicorn -c gunicorn.conf.py
+chdir = os.path.abspath(os.path.dirname(__file__))
+wsgi_app = "wsgi:app"
+bind = "0.0.0.0:5001"
+
+# several workers with a few threads each, so a long /run-pipeline request doesn't block the other endpoints
+workers = max(2, cpu_count() // 2)
+# every worker has its own pipeline process pool, share the CPUs between the pools instead of a pool of
+# cpu_count() processes per worker
+raw_env = [f"ETL_PIPELINE_WORKERS={max(1, cpu_count() // workers)}"]
+worker_class = "gthread"
+threads = 4
+
+# every worker imports the app on its own and creates its own pipeline process pool,
+# a pool created before the fork would share its task queues between the workers
+preload_app = False
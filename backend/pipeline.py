@@ -1,3 +1,4 @@
+import io
 import os
 import json
 from etl import validate_and_process_json as json_validate, input_handler as input_handler, process_txt as txt
@@ -8,10 +9,11 @@ import sys
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 LOG_DIR = os.path.join(BASE_DIR, "tests")
 LOG_FILE = os.path.join(LOG_DIR, "etl_pipeline.log")
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
+    format=LOG_FORMAT,
     handlers=[
         logging.FileHandler(LOG_FILE),
         logging.StreamHandler()
@@ -23,37 +25,46 @@ def extract(input_json):
     Extract input data and validate file paths.
 
     :param input_json: Path to the input JSON file.
-    :return: context_path, results_path, participant_files.
+    :return: context_path, results_path, participant_id, participant_files.
     """
     try:
         logging.info("Starting the extract stage")
 
-        # raise an error if the input file doesn't exist
-        if not os.path.exists(input_json):
-            logging.error(f"Input file not found: {input_json}")
-            raise FileNotFoundError(f"Input file does not exist: {input_json}")
-
+        # raise an error if the input file is not a .JSON file
         if not input_json.lower().endswith('.json'):
-            logging.error(f"Input file is not a .JSON file: {input_json}")
+            logging.error("Input file is not a .JSON file: %s", input_json)
+            raise ValueError(f"Input file is not a .JSON file: {input_json}")
+
+        # raise an error if the input file doesn't exist, found by opening it instead of checking it beforehand
+        try:
+            file = open(input_json, 'r')
+        except (FileNotFoundError, NotADirectoryError):
+            logging.error("Input file not found: %s", input_json)
+            raise FileNotFoundError(f"Input file does not exist: {input_json}")
+        except IsADirectoryError:
+            logging.error("Input file is not a .JSON file: %s", input_json)
             raise ValueError(f"Input file is not a .JSON file: {input_json}")
+        except OSError as e:
+            logging.error("Input file could not be read: %s", input_json)
+            raise ValueError(f"Input file could not be read: {input_json}") from e
 
         # load and parse the JSON file
-        with open(input_json, 'r') as file:
+        with file:
             input_data = json.load(file)
-            logging.debug(f"Loaded input JSON: {input_data}")
+            logging.debug("Loaded input JSON: %s", input_data)
 
         # validate and load input paths
         context_path, results_path = input_handler.validate_input_file(input_data)
-        logging.info(f"Validated paths: context_path={context_path}, results_path={results_path}")
+        logging.info("Validated paths: context_path=%s, results_path=%s", context_path, results_path)
 
         # validate the files existence, format, naming in the context path
-        participant_files = input_handler.validate_context_path_files(context_path)
-        logging.info(f"Validated participant files: {participant_files}")
+        participant_id, participant_files = input_handler.validate_context_path_files(context_path)
+        logging.info("Validated participant files: %s", participant_files)
     except ValueError:
         logging.error("Exiting the pipeline due to validation error")
         sys.exit(1)
 
-    return context_path, results_path, participant_files
+    return context_path, results_path, participant_id, participant_files
 
 
 def transform(participant_files):
@@ -72,7 +83,7 @@ def transform(participant_files):
             logging.error("JSON processing failed.")
             sys.exit(1)  # Exit if the processing fails
 
-        logging.debug(f"Processed JSON results: {json_result}")
+        logging.debug("Processed JSON results: %s", json_result)
 
     except ValueError:
         logging.error("Exiting the pipeline due to validation error")
@@ -81,7 +92,7 @@ def transform(participant_files):
     # process the .txt file
     try:
         txt_results = txt.process_txt_files(participant_files[".txt"])
-        logging.debug(f"Processed TXT results: {txt_results}")
+        logging.debug("Processed TXT results: %s", txt_results)
 
     except ValueError:
         logging.error("Exiting the pipeline due to validation error")
@@ -91,7 +102,7 @@ def transform(participant_files):
     return txt_results, json_result
 
 
-def load(context_path, results_path, txt_results, json_result, participant_files, start_time):
+def load(context_path, results_path, txt_results, json_result, participant_id, start_time):
     """
     Merge and write the transformed results to the output file.
 
@@ -99,16 +110,11 @@ def load(context_path, results_path, txt_results, json_result, participant_files
     :param results_path: Path to save the output file.
     :param txt_results: Results from .txt file processing.
     :param json_result: validated and cleansed .json metadata.
-    :param participant_files: Dictionary mapping file extensions to file paths.
+    :param participant_id: The participant ID validated from the file names in the extract stage.
     :param start_time: Start time of processing the data
     """
     logging.info("Starting the Load stage.")
 
-    # extract the participant ID from the file name
-    participant_id = os.path.splitext(os.path.basename(participant_files[".txt"]))[0]
-    if participant_id.endswith("_dna"):
-        participant_id = participant_id[:-4]
-
     # merge the results
     merged_results = {
         "metadata": {
@@ -129,17 +135,17 @@ def load(context_path, results_path, txt_results, json_result, participant_files
     }
     # if the results path doesn't exist, create it
     if not os.path.exists(results_path):
-        logging.info(f"Creating results directory at {results_path}")
+        logging.info("Creating results directory at %s", results_path)
         os.makedirs(results_path)
     # write the merged result into a file in the results_path
     output_file_path = os.path.join(results_path, f"{participant_id}.json")
     with open(output_file_path, 'w') as output_file:
         json.dump(merged_results, output_file, indent=4)
 
-    logging.info(f"Load stage completed successfully. Results saved to {output_file_path}")
+    logging.info("Load stage completed successfully. Results saved to %s", output_file_path)
 
 
-def main():
+def main(input_json=None):
     """
     Main function to execute the ETL pipeline.
 
@@ -149,41 +155,74 @@ def main():
     3. Load: Saves the processed results to the specified output directory.
 
     Logs the start and end times of execution and handles errors gracefully.
+
+    :param input_json: Path to the input JSON file, read from the command-line arguments if not given.
     """
     try:
         logging.info("ETL pipeline started.")
         start_at = datetime.now()
-        # check if the input JSON file is provided as a command-line argument
-        if len(sys.argv) < 2:
-            logging.error("Input JSON file is required as an argument.")
-            raise ValueError("Input JSON file is required as an argument.")
+        if input_json is None:
+            # check if the input JSON file is provided as a command-line argument
+            if len(sys.argv) < 2:
+                logging.error("Input JSON file is required as an argument.")
+                raise ValueError("Input JSON file is required as an argument.")
 
-        input_json = sys.argv[1] # extracting the .json file input
+            input_json = sys.argv[1] # extracting the .json file input
         # validate that the provided file exists
-        context_path, results_path, participant_files = extract(input_json)
+        context_path, results_path, participant_id, participant_files = extract(input_json)
         # transform Stage
         txt_results, json_result = transform(participant_files)
         # load stage
-        load(context_path, results_path, txt_results, json_result, participant_files, start_at)
+        load(context_path, results_path, txt_results, json_result, participant_id, start_at)
 
         logging.info("ETL pipeline completed successfully.")
 
     except ValueError as ve:
-        logging.error(f"Validation Error: {ve}")
+        logging.error("Validation Error: %s", ve)
         logging.error("Pipeline exiting due to validation error")
         sys.exit(1)
 
     except FileNotFoundError as fnfe:
-        logging.error(f"File Error: {fnfe}")
+        logging.error("File Error: %s", fnfe)
         logging.error("Pipeline exiting due to validation error")
         sys.exit(1)
 
     except Exception as e:
-        logging.error(f"Unexpected Error: {e}", exc_info=True)
+        logging.error("Unexpected Error: %s", e, exc_info=True)
         logging.error("Pipeline exiting due to an unexpected error")
         sys.exit(1)
 
 
+def run(input_json, txt_workers=None):
+    """
+    Run the ETL pipeline in the current process and capture its log output.
+
+    :param input_json: Path to the input JSON file.
+    :param txt_workers: The number of processes the TXT stages may use, see txt.set_process_pool_workers.
+        By default a worker per CPU, or none when already running inside a worker process.
+    :return: A tuple (logs, ok) with the captured logs and whether the pipeline succeeded.
+    """
+    txt.set_process_pool_workers(txt_workers)
+    log_stream = io.StringIO()
+    handler = logging.StreamHandler(log_stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+    try:
+        main(input_json)
+        ok = True
+    except SystemExit as exit_status:
+        # the pipeline stages exit on failure, translate it to a status instead of stopping the caller
+        ok = not exit_status.code
+    finally:
+        root_logger.removeHandler(handler)
+        # the processes started for the TXT stages end with the run, a pool worker running it can't exit
+        # while they are still alive
+        txt.shutdown_process_pool()
+
+    return log_stream.getvalue(), ok
+
+
 if __name__ == "__main__":
     main()
 
@@ -1,15 +1,43 @@
 
 import pytest
-import subprocess
 import os
+import sys
 import json
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import multiprocessing
+import app
+import pipeline
+from etl import process_txt, validate_and_process_json
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date
 
 
 
 def run_pipeline(input_file):
-    """Run the ETL pipeline and return the process result."""
-    result = subprocess.run(["python", "backend/pipeline.py", input_file], capture_output=True, text=True)
-    return result
+    """
+    Run the ETL pipeline in the test process, without starting a new interpreter per test.
+    Returns a tuple (logs, ok) with the pipeline log output and whether it succeeded.
+    """
+    return pipeline.run(input_file)
+
+@pytest.fixture(autouse=True)
+def pipeline_log_level(caplog):
+    """Log at INFO level as the command-line pipeline does, the pytest log handlers keep its own setup from applying."""
+    caplog.set_level(logging.INFO)
+
+class PinnedDate(date):
+    """A date whose today() is fixed, so the participant ages in the test inputs don't change with the clock."""
+
+    @classmethod
+    def today(cls):
+        return cls(2025, 5, 1)
+
+@pytest.fixture(autouse=True)
+def pinned_today(monkeypatch):
+    """Calculate the participant ages at a fixed date, the under 40 participant (born 1985-05-15) stays 39."""
+    monkeypatch.setattr(validate_and_process_json, "date", PinnedDate)
 
 @pytest.mark.parametrize("test_input,expected_error", [
     ("under_40_input.json", "Participant's age '39' is less than 40 years old."),
@@ -31,31 +59,27 @@ def run_pipeline(input_file):
 def test_pipeline_edge_cases(test_input, expected_error):
     """Test the ETL pipeline for various edge cases."""
     input_file_path = os.path.join("inputs", test_input)
-    result = run_pipeline(input_file_path)
+    logs, ok = run_pipeline(input_file_path)
 
-    assert result.returncode != 0, f"Pipeline should fail for {test_input}"
-    assert expected_error in result.stderr, f"Expected error '{expected_error}' not found in {test_input} log."
+    assert not ok, f"Pipeline should fail for {test_input}"
+    assert expected_error in logs, f"Expected error '{expected_error}' not found in {test_input} log."
 
 def test_pipeline_success():
     """Test the ETL pipeline with valid input to ensure success."""
     valid_input_file = "inputs/valid_input.json"
-    result = run_pipeline(valid_input_file)
+    logs, ok = run_pipeline(valid_input_file)
 
-    assert result.returncode == 0, "Pipeline should succeed with valid input"
-    assert "ETL pipeline completed successfully" in result.stderr, "Pipeline did not complete as expected."
+    assert ok, "Pipeline should succeed with valid input"
+    assert "ETL pipeline completed successfully" in logs, "Pipeline did not complete as expected."
 
 def test_valid_input():
     """
     Test the pipeline with a valid input file.
     """
     input_file = "inputs/valid_input.json"
-    result = subprocess.run(
-        ["python", "backend/pipeline.py", input_file],
-        capture_output=True,
-        text=True
-    )
-    assert result.returncode == 0, f"Pipeline failed: {result.stderr}"
-    assert "ETL pipeline completed successfully" in result.stderr, "Pipeline did not complete as expected."
+    logs, ok = run_pipeline(input_file)
+    assert ok, f"Pipeline failed: {logs}"
+    assert "ETL pipeline completed successfully" in logs, "Pipeline did not complete as expected."
 
     # Check if the results file is generated
     with open(input_file, 'r') as f:
@@ -70,4 +94,117 @@ def test_valid_input():
     with open(output_file, 'r') as output_f:
         results_data = json.load(output_f)
         assert results_data["metadata"]["context_path"] == input_data["context_path"], "Context path mismatch in output"
-        assert results_data["metadata"]["results_path"] == results_path, "Results path mismatch in output"
\ No newline at end of file
+        assert results_data["metadata"]["results_path"] == results_path, "Results path mismatch in output"
+
+
+@pytest.mark.parametrize("sequence,expected", [
+    ("GGCC", 100.0),
+    ("ATGCAT", 33.33),
+    ("ATAT", 0.0),
+    ("", 0.0),
+])
+def test_calc_gc_content(sequence, expected):
+    """Test the GC content percentage, including an empty sequence."""
+    assert process_txt.calc_gc_content(sequence) == expected
+    assert process_txt.process_sequence(sequence)["gc_content"] == expected
+
+
+@pytest.mark.parametrize("sequence1,sequence2,expected", [
+    ("ATCGATCGTAGCTAGCTAGCTGATCGATCGAT", "ATCGATCGTAGCTAGCTAGCTGATCGATCGA", "ATCGATCGTAGCTAGCTAGCTGATCGATCGA"),
+    ("AAAAAAAAAAAAA", "ATCGATCGTAGCTAGCTAGCTGATCGATCGA", "A"),
+    ("ACGTTGCA", "TTGCAACG", "TTGCA"),
+    ("ACGAAATG", "TGAAACGA", "ACGA"),
+    ("AAAA", "CCCC", ""),
+    ("", "ACGT", ""),
+])
+def test_find_lcs_of_two(sequence1, sequence2, expected):
+    """Test the longest common substring of two sequences, keeping the first one in sequence1 on ties."""
+    assert process_txt.find_lcs_of_two(sequence1, sequence2) == expected
+
+
+def test_find_lcs_of_two_min_length():
+    """Test that common substrings shorter than the minimal length are not returned."""
+    assert process_txt.find_lcs_of_two("ACGTTT", "GGACGA", 3) == "ACG"
+    assert process_txt.find_lcs_of_two("ACGTTT", "GGACGA", 4) == ""
+    assert process_txt.find_lcs_of_two("TTACGTACGG", "ACGG", 2) == "ACGG"
+    assert process_txt.find_lcs_of_two("ACGT", "AC", 3) == ""
+
+
+@pytest.mark.parametrize("sequences,expected", [
+    (["ACGTTGCA", "TTGCAACG", "GGGG"], {"TTGCA": [1, 2]}),
+    # only the first of the pair's longest common substrings counts, like in the pairwise search
+    (["ACGTTTTTGCA", "ACGCCCCCGCA"], {"ACG": [1, 2]}),
+    (["ACGTTT", "ACGAAA", "TTTAAA"], {"ACG": [1, 2], "TTT": [1, 3], "AAA": [2, 3]}),
+    (["ACGT", "TTTT", "ACGT"], {"ACGT": [1, 3]}),
+    (["AAAA", "CCCC"], {}),
+])
+def test_compute_longest_common_substring_global(sequences, expected):
+    """Test the single-pass search for the longest substrings shared by at least two sequences."""
+    result = process_txt.compute_longest_common_substring_global(sequences)
+    assert result == expected
+    assert list(result) == list(expected)
+    assert result == process_txt.find_pairwise_lcs_candidates(sequences)
+
+
+@pytest.mark.parametrize("long_sequence", ["N" * process_txt.GLOBAL_LCS_MIN_LENGTH, "N" * (process_txt.GLOBAL_LCS_MIN_LENGTH + 1)])
+def test_compute_longest_common_subsequence_global_threshold(long_sequence):
+    """Test the LCS result is the same on both sides of the single-pass search threshold."""
+    result = process_txt.compute_longest_common_subsequence(["ACGTTTTTGCA", "ACGCCCCCGCA", long_sequence])
+    assert result == {"value": "ACG", "sequences": [1, 2], "length": 3}
+
+
+@pytest.mark.parametrize("today,expected_error", [
+    (date(2025, 5, 15), None),
+    (date(2025, 5, 14), "Participant's age '39' is less than 40 years old."),
+    # 40 years minus 10 days, more than 40 * 365 days because of the leap days
+    (date(2025, 5, 5), "Participant's age '39' is less than 40 years old."),
+])
+def test_validate_participants_age(today, expected_error):
+    """Test the participant age is calculated in full calendar years."""
+    data = {"individual_metadata": {"date_of_birth": "1985-05-15"}}
+    if expected_error is None:
+        validate_and_process_json.validate_participants_age(data, today)
+    else:
+        with pytest.raises(ValueError, match=expected_error):
+            validate_and_process_json.validate_participants_age(data, today)
+
+
+class RecordingPool:
+    """A stand-in for the API's pipeline pool, recording the submitted jobs instead of running them."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, func, *args):
+        self.jobs.append(args)
+        future = Future()
+        future.set_result(("", True))
+        return future
+
+def test_run_pipeline_single_file_cpu_budget(monkeypatch):
+    """Test a single file submitted through the API may use every CPU for its TXT stages."""
+    pool = RecordingPool()
+    monkeypatch.setattr(app, "get_pipeline_pool", lambda: pool)
+    response = app.app.test_client().post("/run-pipeline", json={"input_files": ["valid_input.json"]})
+
+    assert response.status_code == 200
+    assert [txt_workers for _, txt_workers in pool.jobs] == [os.cpu_count()]
+
+
+def get_pid(_):
+    """Helper function - Return the ID of the process running it."""
+    return os.getpid()
+
+def run_parallel_map_in_worker(txt_workers):
+    """Helper function - Run parallel_map inside a pool worker, return whether the items ran in other processes."""
+    process_txt.set_process_pool_workers(txt_workers)
+    try:
+        return os.getpid() not in set(process_txt.parallel_map(get_pid, list(range(8))))
+    finally:
+        process_txt.shutdown_process_pool()
+
+def test_parallel_map_in_pool_worker():
+    """Test a pipeline job in a pool worker starts no nested pool unasked, but fans out with a CPU budget."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as executor:
+        assert not executor.submit(run_parallel_map_in_worker, None).result()
+        assert executor.submit(run_parallel_map_in_worker, 2).result()
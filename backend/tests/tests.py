@@ -1,5 +1,8 @@
 import logging
-import subprocess
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
 # Configure logging for the test script
 logging.basicConfig(
@@ -29,20 +32,19 @@ test_cases = [
     {"name": "Valid Input", "input_file": "inputs/valid_input.json", "expected_error": None},
 ]
 
+# imported after the logging setup above, so the pipeline's own logging.basicConfig doesn't replace it
+import pipeline
 
 for test in test_cases:
     logging.info(f"Running Test: {test['name']}")
-    result = subprocess.run(
-        ["python", "backend/pipeline.py", test["input_file"]],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        if test["expected_error"] in result.stderr:
-            logging.info(f"Test {test['name']} failed as expected with the following logs:\n{result.stderr.strip()}")
+    # run the pipeline in this process instead of starting a new interpreter per test case
+    logs, ok = pipeline.run(test["input_file"])
+    if not ok:
+        if test["expected_error"] in logs:
+            logging.info(f"Test {test['name']} failed as expected with the following logs:\n{logs.strip()}")
         else:
-            logging.error(f"Test {test['name']} failed with unexpected error logs:\n{result.stderr.strip()}")
+            logging.error(f"Test {test['name']} failed with unexpected error logs:\n{logs.strip()}")
     else:
-        logging.info(f"Test {test['name']} passed! \n{result.stderr.strip()}")
+        logging.info(f"Test {test['name']} passed! \n{logs.strip()}")
 
     logging.info("-" * 50)
\ No newline at end of file
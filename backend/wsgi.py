@@ -0,0 +1,2 @@
+# WSGI entry point for running the Flask API under a production server, e.g. gunicorn -c gunicorn.conf.py
+from app import app